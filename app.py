@@ -1,16 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.orm import Session, raiseload
+from typing import Optional
 import os
+import uuid
 
 from models import ProcessedData, DataRequest
 from database import get_db, engine, Base, init_db
 import schemas
 from data_ingestion import start_ingestion_job
+from utils import serialize_pydantic_to_bytes
 
 # Initialize FastAPI app
-app = FastAPI(title="Data Processing API", version="1.0.0")
+app = FastAPI(title="Data Processing API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -43,7 +46,7 @@ async def ingest_data(request: schemas.DataIngestionRequest):
     return {"job_id": job_id, "status": "processing"}
 
 @app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
-async def get_job_status(job_id: str, db: Session = Depends(get_db)):
+async def get_job_status(job_id: uuid.UUID, db: Session = Depends(get_db)):
     """Get the status of a data ingestion job."""
     # Query the database for the job status
     job = db.query(DataRequest).filter(DataRequest.id == job_id).first()
@@ -52,27 +55,36 @@ async def get_job_status(job_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
     
     return {
-        "job_id": job_id, 
+        "job_id": str(job_id), 
         "status": job.status, 
         "records_processed": job.records_processed,
         "error_message": job.error_message
     }
 
-@app.get("/data", response_model=List[schemas.ProcessedDataResponse])
+@app.get("/data", response_model=schemas.ProcessedDataPage)
 async def get_data(
     category: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Retrieve processed data with optional filtering."""
-    query = db.query(ProcessedData)
+    """Retrieve processed data with optional filtering, paginated by id cursor."""
+    # The response schema never touches relationships, so forbid lazy loads (no N+1)
+    query = db.query(ProcessedData).options(raiseload("*")).order_by(ProcessedData.id)
     
     if category:
         query = query.filter(ProcessedData.category == category)
     
-    result = query.limit(limit).offset(offset).all()
-    return result
+    # Keyset pagination: seek past the last seen id instead of scanning an offset
+    if after is not None:
+        query = query.filter(ProcessedData.id > after)
+    
+    result = query.limit(limit).all()
+    next_cursor = result[-1].id if result and len(result) == limit else None
+    
+    # Serialize the page in one pass instead of FastAPI's validate-then-encode round trip
+    page = schemas.ProcessedDataPage(items=result, next_cursor=next_cursor)
+    return Response(content=serialize_pydantic_to_bytes(page), media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
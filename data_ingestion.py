@@ -1,15 +1,24 @@
 import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 from celery import Celery
+from celery.exceptions import Retry as TaskRetry
+from celery.signals import worker_init, worker_process_init
+from celery_batches import Batches
 from typing import List, Dict, Any
 import json
 import os
 import datetime
+import operator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from database import SessionLocal
+from sqlalchemy import text
+
+from database import SessionLocal, engine
 from models import DataRequest, ProcessedData
-from utils import serialize_pydantic
+from utils import serialize_pydantic, uuid7
 
 # Get Redis URL from environment or use default
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
@@ -21,6 +30,36 @@ celery = Celery(
     backend=REDIS_URL
 )
 
+# Batches needs unlimited prefetch so a worker can hold a full batch
+celery.conf.worker_prefetch_multiplier = 0
+
+# Flush a batch of ingestion jobs every N messages or T seconds, whichever comes first
+BATCH_FLUSH_EVERY = 50
+BATCH_FLUSH_INTERVAL = 5
+
+@worker_init.connect
+def configure_gevent_pool(**kwargs):
+    """Make psycopg2 cooperative when the worker runs under the gevent pool."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return
+    
+    # Celery monkey-patches sockets itself for `-P gevent`; psycopg2 needs its own wait callback
+    if monkey.is_module_patched("socket"):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        # The gevent pool never forks, so warm the pool here rather than per child process
+        warm_db_pool()
+
+@worker_process_init.connect
+def warm_db_pool(**kwargs):
+    """Open a pooled database connection up front so the first job skips the connect handshake."""
+    # Connections inherited from a forking parent must not be shared with it
+    engine.dispose(close=False)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,9 +71,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent source fetches per task (greenlets under the gevent pool)
+FETCH_MAX_WORKERS = 64
+
+# Shared HTTP session so repeated fetches reuse pooled keep-alive connections;
+# sized so every concurrent fetch to one host can keep its connection
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=FETCH_MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.3)
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+# (connect, read) timeouts in seconds for source fetches
+REQUEST_TIMEOUT = (3, 30)
+
+# Number of rows per bulk insert when storing processed data
+STORE_CHUNK_SIZE = 1000
+
 def start_ingestion_job(sources, transformation_rules=None):
     """Start a new data ingestion job and return the job ID."""
-    job_id = str(uuid.uuid4())
+    job_id = uuid7()
     
     # Store the job request in the database
     db = SessionLocal()
@@ -49,77 +108,205 @@ def start_ingestion_job(sources, transformation_rules=None):
     serializable_sources = serialize_pydantic(sources)
     serializable_transformation_rules = serialize_pydantic(transformation_rules) if transformation_rules else None
     
-    # Start the Celery task asynchronously
-    process_data.delay(job_id, serializable_sources, serializable_transformation_rules)
+    # Queue the job; the worker coalesces queued jobs into batches
+    process_data_batch.delay(str(job_id), serializable_sources, serializable_transformation_rules)
     
-    return job_id, request
+    return str(job_id), request
 
 @celery.task(bind=True, max_retries=3)
 def process_data(self, job_id, sources, transformation_rules=None):
     """Process data from multiple sources and apply transformations."""
     db = SessionLocal()
     try:
-        # Update job status to processing
-        request = db.query(DataRequest).filter(DataRequest.id == job_id).first()
+        request = _begin_job(db, job_id, sources)
         if not request:
-            logger.error(f"Job ID {job_id} not found")
             return
         
-        logger.info(f"Processing job {job_id} with sources: {sources}")
-        request.status = "processing"
-
-        db.commit()
+        results, errors = _fetch_sources(sources, transformation_rules)
+        if errors:
+            # Retry the task if any source failed
+            self.retry(exc=errors[0], countdown=30)
         
-        records_processed = 0
+        _complete_job(db, request, results)
         
-        # Process each data source
-        for source in sources:
+    except TaskRetry:
+        raise
+    
+    except Exception as e:
+        _fail_job(db, job_id, e)
+    
+    finally:
+        db.close()
+
+@celery.task(base=Batches, flush_every=BATCH_FLUSH_EVERY, flush_interval=BATCH_FLUSH_INTERVAL)
+def process_data_batch(task_requests):
+    """Process a batch of queued ingestion jobs over a single database session."""
+    db = SessionLocal()
+    try:
+        jobs = {task_request.args[0]: task_request.args for task_request in task_requests}
+        records_processed = dict.fromkeys(jobs)
+        try:
+            requests_by_id = _begin_jobs(db, jobs)
+            # One fan-out for every source of every job, so a batch takes about as long as its slowest job
+            outcomes = _fetch_batch([jobs[job_id] for job_id in requests_by_id])
+        except Exception as e:
+            for job_id in jobs:
+                _fail_job(db, job_id, e)
+            requests_by_id, outcomes = {}, {}
+        
+        for job_id, request in requests_by_id.items():
+            results, errors = outcomes[job_id]
+            if errors:
+                # Hand failed jobs to the single-job task, which owns retries
+                process_data.apply_async(jobs[job_id], countdown=30)
+                continue
             try:
-                # Fetch data based on source type
-                logger.info(f"Fetching data from {source['url']}")
-                if source["source_type"] == "rest":
-                    data = fetch_rest_data(source["url"], source.get("headers"), source.get("params"))
-                elif source["source_type"] == "graphql":
-                    data = fetch_graphql_data(source["url"], source.get("query"), source.get("headers"))
-                else:
-                    logger.warning(f"Unsupported source type: {source['source_type']}")
-                    continue
-                request.status = "before_transformation"
-                # Apply transformations
-                if transformation_rules:
-                    data = apply_transformations(data, transformation_rules)
-                
-                # Store processed data
-                store_processed_data(db, job_id, source["source_type"], data)
-                
-                records_processed += len(data) if isinstance(data, list) else 1
-                
+                # A savepoint per job keeps one bad job from rolling back the rest of the batch
+                with db.begin_nested():
+                    records_processed[job_id] = _store_job(db, request, results)
             except Exception as e:
-                logger.error(f"Error processing source {source['url']}: {str(e)}")
-                # Retry the task if there's an error
-                self.retry(exc=e, countdown=30)
-        
-        # Update job status to completed
-        request.status = "completed"
-        request.records_processed = records_processed
-        request.completed_at = datetime.datetime.utcnow()  # Add completion timestamp
-        db.commit()
+                logger.error(f"Error processing job {job_id}: {str(e)}")
+                request.status = "failed"
+                request.error_message = str(e)
         
-        logger.info(f"Job {job_id} completed. Processed {records_processed} records.")
+        try:
+            db.commit()
+        except Exception as e:
+            for job_id in requests_by_id:
+                _fail_job(db, job_id, e)
+                records_processed[job_id] = None
+        else:
+            for job_id, count in records_processed.items():
+                if count is not None:
+                    logger.info(f"Job {job_id} completed. Processed {count} records.")
         
-    except Exception as e:
-        logger.error(f"Error processing job {job_id}: {str(e)}")
-        request.status = "failed"
-        request.error_message = str(e)
-        db.commit()
-    
+        for task_request in task_requests:
+            celery.backend.mark_as_done(
+                task_request.id, records_processed[task_request.args[0]], request=task_request
+            )
     finally:
         db.close()
 
+def _begin_job(db, job_id, sources):
+    """Mark a job as processing and return its DataRequest, or None if it does not exist."""
+    request = db.query(DataRequest).filter(DataRequest.id == uuid.UUID(job_id)).first()
+    if not request:
+        logger.error(f"Job ID {job_id} not found")
+        return None
+    
+    logger.info(f"Processing job {job_id} with sources: {sources}")
+    request.status = "processing"
+    db.commit()
+    
+    return request
+
+def _begin_jobs(db, jobs):
+    """Mark a batch of jobs as processing in one commit and return their DataRequests by job ID."""
+    requests_by_id = {
+        str(request.id): request
+        for request in db.query(DataRequest).filter(
+            DataRequest.id.in_([uuid.UUID(job_id) for job_id in jobs])
+        )
+    }
+    for job_id in jobs:
+        request = requests_by_id.get(job_id)
+        if not request:
+            logger.error(f"Job ID {job_id} not found")
+            continue
+        logger.info(f"Processing job {job_id} with sources: {jobs[job_id][1]}")
+        request.status = "processing"
+    db.commit()
+    
+    return requests_by_id
+
+def _fetch_sources(sources, transformation_rules=None):
+    """Fetch and transform all sources concurrently, returning (results, errors)."""
+    return _fetch_batch([(None, sources, transformation_rules)])[None]
+
+def _fetch_batch(jobs):
+    """Fetch and transform the sources of several jobs concurrently, returning {job_id: (results, errors)}."""
+    outcomes = {job_id: ([], []) for job_id, _, _ in jobs}
+    work = [
+        (job_id, source, transformation_rules)
+        for job_id, sources, transformation_rules in jobs
+        for source in sources
+    ]
+    
+    # The DB session stays on the calling thread; workers only fetch and transform
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_MAX_WORKERS, len(work)))) as pool:
+        futures = {
+            pool.submit(_fetch_one, source, transformation_rules): (job_id, source)
+            for job_id, source, transformation_rules in work
+        }
+        for future in as_completed(futures):
+            job_id, source = futures[future]
+            results, errors = outcomes[job_id]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error processing source {source['url']}: {str(e)}")
+                errors.append(e)
+                continue
+            if result is not None:
+                results.append(result)
+    
+    return outcomes
+
+def _fetch_one(source, transformation_rules=None):
+    """Fetch and transform a single source, returning (source_type, data) or None if unsupported."""
+    logger.info(f"Fetching data from {source['url']}")
+    if source["source_type"] == "rest":
+        data = fetch_rest_data(source["url"], source.get("headers"), source.get("params"))
+    elif source["source_type"] == "graphql":
+        data = fetch_graphql_data(source["url"], source.get("query"), source.get("headers"))
+    else:
+        logger.warning(f"Unsupported source type: {source['source_type']}")
+        return None
+    
+    # Apply transformations
+    if transformation_rules:
+        data = apply_transformations(data, transformation_rules)
+    
+    return source["source_type"], data
+
+def _complete_job(db, request, results):
+    """Store fetched results, mark the job completed and return the record count."""
+    # Everything stored for the job is committed as one transaction
+    records_processed = _store_job(db, request, results)
+    db.commit()
+    
+    logger.info(f"Job {request.id} completed. Processed {records_processed} records.")
+    return records_processed
+
+def _store_job(db, request, results):
+    """Store fetched results and mark the job completed without committing; return the record count."""
+    records_processed = 0
+    
+    for source_type, data in results:
+        store_processed_data(db, request.id, source_type, data)
+        records_processed += len(data) if isinstance(data, list) else 1
+    
+    # Update job status to completed
+    request.status = "completed"
+    request.records_processed = records_processed
+    request.completed_at = datetime.datetime.now(datetime.timezone.utc)  # Add completion timestamp
+    
+    return records_processed
+
+def _fail_job(db, job_id, error):
+    """Record a job failure."""
+    logger.error(f"Error processing job {job_id}: {str(error)}")
+    db.rollback()
+    request = db.query(DataRequest).filter(DataRequest.id == uuid.UUID(job_id)).first()
+    if request:
+        request.status = "failed"
+        request.error_message = str(error)
+        db.commit()
+
 def fetch_rest_data(url, headers=None, params=None):
     """Fetch data from a REST API."""
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = _session.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -129,10 +316,11 @@ def fetch_rest_data(url, headers=None, params=None):
 def fetch_graphql_data(url, query, headers=None):
     """Fetch data from a GraphQL API."""
     try:
-        response = requests.post(
+        response = _session.post(
             url,
             json={"query": query},
-            headers=headers
+            headers=headers,
+            timeout=REQUEST_TIMEOUT
         )
         response.raise_for_status()
         return response.json()
@@ -171,60 +359,48 @@ def rename_field(data, old_field, new_field):
     
     return data
 
+# Comparison used by filter_data for each supported condition operator
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "contains": lambda field_value, value: value in field_value,
+}
+
 def filter_data(data, field, condition):
     """Filter data based on a condition."""
     # Only process if data is a list
     if not isinstance(data, list):
         return data
     
-    filtered_data = []
-    condition_op = condition.get("operator", "eq")
+    compare = FILTER_OPERATORS.get(condition.get("operator", "eq"))
     condition_value = condition.get("value")
     
-    for item in data:
-        if not isinstance(item, dict) or field not in item:
-            continue
-            
-        field_value = item[field]
-        
-        # Apply the appropriate comparison
-        include_item = False
-        if condition_op == "eq":
-            include_item = field_value == condition_value
-        elif condition_op == "neq":
-            include_item = field_value != condition_value
-        elif condition_op == "gt":
-            include_item = field_value > condition_value
-        elif condition_op == "lt":
-            include_item = field_value < condition_value
-        elif condition_op == "contains":
-            include_item = condition_value in field_value
-        
-        if include_item:
-            filtered_data.append(item)
+    # Unknown operators match nothing
+    if compare is None:
+        return []
     
-    return filtered_data
+    return [
+        item for item in data
+        if isinstance(item, dict) and field in item and compare(item[field], condition_value)
+    ]
 
 def store_processed_data(db, job_id, source, data):
     """Store processed data in the database."""
-    # For list data, insert each item
-    if isinstance(data, list):
-        for item in data:
-            processed_data = ProcessedData(
-                request_id=job_id,
-                source=source,
-                category=item.get("category", "uncategorized"),
-                data=item
-            )
-            db.add(processed_data)
-    else:
-        # For single item data
-        processed_data = ProcessedData(
-            request_id=job_id,
-            source=source,
-            category=data.get("category", "uncategorized"),
-            data=data
-        )
-        db.add(processed_data)
+    # Normalize single-item data to a list so both shapes share one insert path
+    items = data if isinstance(data, list) else [data]
     
-    db.commit()
+    rows = [
+        {
+            "request_id": job_id,
+            "source": source,
+            "category": item.get("category", "uncategorized"),
+            "data": item
+        }
+        for item in items
+    ]
+    
+    # Core executemany insert (no ORM per-row bookkeeping), chunked to bound memory; the caller commits
+    for start in range(0, len(rows), STORE_CHUNK_SIZE):
+        db.execute(ProcessedData.__table__.insert(), rows[start:start + STORE_CHUNK_SIZE])
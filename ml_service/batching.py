@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import torch
+
+logger = logging.getLogger(__name__)
+
+class PredictionBatcher:
+    """Coalesces concurrent prediction requests into a single forward pass per model"""
+
+    def __init__(self, max_batch_size: int = 64, max_wait_ms: float = 8):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background batching loop on the running event loop"""
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_task_done)
+
+    async def stop(self):
+        """Stop the background batching loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _on_task_done(task: asyncio.Task):
+        """Log if the batching loop stops for any reason other than stop()"""
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            logger.error("Prediction batcher stopped", exc_info=exc)
+        else:
+            logger.error("Prediction batcher stopped unexpectedly")
+
+    async def predict(self, model: Any, inputs: torch.Tensor) -> torch.Tensor:
+        """Queue inputs for a model and wait for this request's slice of the batched output"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((model, inputs, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, torch.Tensor, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        rows = batch[0][1].shape[0]
+        deadline = loop.time() + self.max_wait
+
+        while rows < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            rows += item[1].shape[0]
+
+        return batch
+
+    async def _run(self):
+        """Run batched inference until cancelled"""
+        while True:
+            batch = await self._collect()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one bad batch end the loop; fail whatever is still waiting in it
+                logger.error(f"Batched prediction error: {str(e)}")
+                self._fail(batch, e)
+
+    def _run_batch(self, batch: List[Tuple[Any, torch.Tensor, asyncio.Future]]):
+        """Split a batch by model and feature shape and run each group"""
+        # Only requests for the same model and feature shape can share a tensor
+        groups: Dict[Tuple[int, Tuple[int, ...]], list] = {}
+        for item in batch:
+            model, inputs, _ = item
+            groups.setdefault((id(model), tuple(inputs.shape[1:])), []).append(item)
+
+        for items in groups.values():
+            self._run_group(items)
+
+    def _run_group(self, items: List[Tuple[Any, torch.Tensor, asyncio.Future]]):
+        """Run one forward pass for a group and scatter the outputs to each request"""
+        model = items[0][0]
+        try:
+            with torch.no_grad():
+                outputs = model(torch.cat([inputs for _, inputs, _ in items]))
+
+            total_rows = sum(inputs.shape[0] for _, inputs, _ in items)
+            if not isinstance(outputs, torch.Tensor) or outputs.dim() == 0 or outputs.shape[0] != total_rows:
+                shape = tuple(outputs.shape) if isinstance(outputs, torch.Tensor) else type(outputs).__name__
+                raise ValueError(f"Model output {shape} does not have a batch dimension of {total_rows}")
+
+            offset = 0
+            for _, inputs, future in items:
+                rows = inputs.shape[0]
+                if not future.done():
+                    future.set_result(outputs[offset:offset + rows])
+                offset += rows
+        except Exception as e:
+            logger.error(f"Batched prediction error: {str(e)}")
+            self._fail(items, e)
+
+    @staticmethod
+    def _fail(items: List[Tuple[Any, torch.Tensor, asyncio.Future]], error: Exception):
+        """Set an exception on every future in items that is still pending"""
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,38 @@
+import numpy as np
+import numba
+
+@numba.njit(parallel=True, cache=True)
+def drift_kernel(ref, curr, out_mean_drift, out_std_ratio):
+    """Fill per-feature normalized mean drift and std ratio in one fused pass per feature"""
+    n_ref = ref.shape[0]
+    n_curr = curr.shape[0]
+
+    for j in numba.prange(ref.shape[1]):
+        # Accumulate around the first reference value so large means do not cancel the variance
+        shift = ref[0, j]
+
+        s_ref = 0.0
+        ss_ref = 0.0
+        for i in range(n_ref):
+            x = ref[i, j] - shift
+            s_ref += x
+            ss_ref += x * x
+
+        s_curr = 0.0
+        ss_curr = 0.0
+        for i in range(n_curr):
+            x = curr[i, j] - shift
+            s_curr += x
+            ss_curr += x * x
+
+        ref_mean = s_ref / n_ref
+        curr_mean = s_curr / n_curr
+        ref_std = np.sqrt(max(ss_ref / n_ref - ref_mean * ref_mean, 0.0))
+        curr_std = np.sqrt(max(ss_curr / n_curr - curr_mean * curr_mean, 0.0))
+
+        ref_scale = ref_std + 1e-10
+        out_mean_drift[j] = abs(ref_mean - curr_mean) / ref_scale
+        out_std_ratio[j] = curr_std / ref_scale
+
+# Compile at import so the first real drift request does not pay the JIT cost
+drift_kernel(np.zeros((1, 1)), np.zeros((1, 1)), np.empty(1), np.empty(1))
@@ -1,17 +1,38 @@
 import os
-import json
+import orjson
 import torch
 import logging
-from typing import Dict, Tuple, List, Any
-import glob
+from typing import Dict, Tuple, List, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+def export_quantized_model(model: torch.nn.Module, example_input: torch.Tensor, model_dir: str) -> str:
+    """
+    Dynamically quantize an eager model to INT8 and save it as the version's quantized variant
+    
+    Run this from the training code, which has the eager model (a TorchScript file cannot be
+    re-quantized), with model_dir pointing at the served version directory. The variant is
+    served once the version's config sets "quantized": true and the version is (re)loaded.
+    """
+    quantized = torch.quantization.quantize_dynamic(
+        model.eval(), {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+    )
+    scripted = torch.jit.trace(quantized, example_input)
+    
+    quantized_dir = os.path.join(model_dir, "quantized")
+    os.makedirs(quantized_dir, exist_ok=True)
+    quantized_path = os.path.join(quantized_dir, "model.pt")
+    scripted.save(quantized_path)
+    
+    return quantized_path
+
 class ModelManager:
     def __init__(self, models_dir="models"):
         self.models_dir = models_dir
         self.models = {}  # Dictionary to store loaded models
         self.default_model_version = None
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._list_cache: Optional[List[Dict[str, Any]]] = None  # Cached list_available_models result
         
         # Create models directory if it doesn't exist
         os.makedirs(self.models_dir, exist_ok=True)
@@ -20,42 +41,64 @@ class ModelManager:
         """Load all available model versions"""
         logger.info("Loading model versions...")
         
-        # Find all model directories
-        model_dirs = glob.glob(os.path.join(self.models_dir, "*"))
+        # Find all model directories (DirEntry caches the type from the directory read)
+        with os.scandir(self.models_dir) as it:
+            model_dirs = [(e.name, e.path) for e in it if e.is_dir(follow_symlinks=False)]
         
         # Clear current models
         self.models = {}
+        self._list_cache = None
         
         if not model_dirs:
             logger.warning("No model versions found")
             return
         
         # Load each model
-        for model_dir in model_dirs:
-            version = os.path.basename(model_dir)
+        for version, model_dir in model_dirs:
             try:
-                # Load model configuration
-                config_path = os.path.join(model_dir, "config.json")
-                with open(config_path, "r") as f:
-                    config = json.load(f)
-                
-                # Load model weights
-                model_path = os.path.join(model_dir, "model.pt")
-                model = torch.jit.load(model_path)
-                model.eval()  # Set model to evaluation mode
-                
-                # Store model and config
-                self.models[version] = {
-                    "model": model,
-                    "config": config
-                }
-                
+                self.models[version] = self._load_version(model_dir)[1]
                 logger.info(f"Loaded model version: {version}")
             
             except Exception as e:
                 logger.error(f"Error loading model version {version}: {str(e)}")
         
-        # Set default model to the latest version if not already set
+        self._ensure_default_model()
+    
+    def load_single(self, version: str):
+        """Load (or reload) a single model version without touching the others"""
+        self.models[version] = self._load_version(os.path.join(self.models_dir, version))[1]
+        self._list_cache = None
+        logger.info(f"Loaded model version: {version}")
+        
+        self._ensure_default_model()
+    
+    def _load_version(self, model_dir: str) -> Tuple[str, Dict[str, Any]]:
+        """Load the model and config stored in a version directory"""
+        version = os.path.basename(model_dir)
+        
+        # Load model configuration
+        config_path = os.path.join(model_dir, "config.json")
+        with open(config_path, "rb") as f:
+            config = orjson.loads(f.read())
+        
+        # Serve the INT8 variant when configured; the FP32 model is then never loaded
+        quantized_path = os.path.join(model_dir, "quantized", "model.pt")
+        if config.get("quantized") and self.device == "cpu" and os.path.exists(quantized_path):
+            model = torch.jit.load(quantized_path, map_location="cpu")
+        else:
+            # Load model weights
+            model = torch.jit.load(os.path.join(model_dir, "model.pt"), map_location=self.device)
+        model.eval()  # Set model to evaluation mode
+        
+        data = {
+            "model": self._optimize_for_inference(model, version),
+            "config": config
+        }
+        
+        return version, data
+    
+    def _ensure_default_model(self):
+        """Set default model to the latest version if not already set"""
         if not self.default_model_version or self.default_model_version not in self.models:
             # Sort versions and get the latest
             versions = sorted(self.models.keys())
@@ -63,6 +106,15 @@ class ModelManager:
                 self.default_model_version = versions[-1]
                 logger.info(f"Set default model version to: {self.default_model_version}")
     
+    def _optimize_for_inference(self, model, version: str):
+        """Freeze and optimize a TorchScript model, falling back to the plain model on failure"""
+        try:
+            frozen = torch.jit.freeze(model)
+            return torch.jit.optimize_for_inference(frozen)
+        except Exception as e:
+            logger.warning(f"Could not optimize model version {version} for inference: {str(e)}")
+            return model
+    
     def get_model(self, version="latest") -> Tuple[Any, str]:
         """Get a specific model version or the latest one"""
         if not self.models:
@@ -78,6 +130,9 @@ class ModelManager:
     
     def list_available_models(self) -> List[Dict[str, Any]]:
         """List all available model versions with their details"""
+        if self._list_cache is not None:
+            return self._list_cache
+        
         result = []
         
         for version, data in self.models.items():
@@ -87,6 +142,7 @@ class ModelManager:
                 "config": data["config"]
             })
         
+        self._list_cache = result
         return result
     
     def set_default_model(self, version: str):
@@ -95,4 +151,5 @@ class ModelManager:
             raise ValueError(f"Model version {version} not found")
         
         self.default_model_version = version
+        self._list_cache = None
         logger.info(f"Set default model version to: {version}")
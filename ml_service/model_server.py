@@ -1,19 +1,22 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 from typing import List, Dict, Any, Optional
 import torch
 import time
+import aiofiles
 
 import os
 import logging
 from datetime import datetime
 import numpy as np
 from starlette.responses import Response
+from fastapi.responses import ORJSONResponse
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram
 
 from model_loader import ModelManager
 from monitoring import ModelMonitor
+from batching import PredictionBatcher
 
 # Configure logging
 logging.basicConfig(
@@ -26,8 +29,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Chunk size used when streaming uploaded model files to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
 # Initialize FastAPI app
-app = FastAPI(title="ML Model Serving API", version="1.0.0")
+app = FastAPI(title="ML Model Serving API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -41,6 +47,7 @@ app.add_middleware(
 # Initialize model manager and monitoring
 model_manager = ModelManager()
 model_monitor = ModelMonitor()
+prediction_batcher = PredictionBatcher(max_batch_size=64, max_wait_ms=8)
 
 # --- Prometheus Metrics ---
 # Create a registry for Prometheus metrics
@@ -50,8 +57,12 @@ request_counter = Counter("api_requests_total", "Total number of API requests",
 prediction_latency = Histogram("api_prediction_latency_seconds", "Latency of predictions", ["model_version"], registry=registry)
 # --------------------------
 
+# Upper bounds on /predict inputs so oversized payloads are rejected before full validation
+MAX_INPUT_ROWS = 4096
+MAX_INPUT_FEATURES = 1024
+
 class PredictionRequest(BaseModel):
-    inputs: List[List[float]]
+    inputs: conlist(conlist(float, min_length=1, max_length=MAX_INPUT_FEATURES), min_length=1, max_length=MAX_INPUT_ROWS)
     model_version: Optional[str] = "latest"
 
 class PredictionResponse(BaseModel):
@@ -62,7 +73,16 @@ class PredictionResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Load models on startup"""
+    # Inference only: use every core and skip autograd bookkeeping
+    torch.set_num_threads(os.cpu_count())
+    torch.set_grad_enabled(False)
     model_manager.load_models()
+    prediction_batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the prediction batcher"""
+    await prediction_batcher.stop()
 
 @app.get("/")
 async def root():
@@ -86,31 +106,29 @@ async def predict(request: PredictionRequest, background_tasks: BackgroundTasks)
     """Make predictions using the specified model version"""
     status_code = 500 # Default to error
     model_version_label = "unknown"
-    start_timer = time.time() # Use time.time for latency calculation
+    t0 = time.perf_counter() # Single clock for both the latency metric and inference_time_ms
     try:
         # Get the model
         model, model_version = model_manager.get_model(request.model_version)
         model_version_label = model_version # Set label for metrics
 
-        # Convert inputs to tensor
-        inputs = torch.tensor(request.inputs, dtype=torch.float32)
+        # Convert inputs to tensor on the model's device (one contiguous copy via numpy)
+        inputs = torch.from_numpy(np.asarray(request.inputs, dtype=np.float32)).to(model_manager.device)
 
-        # Record start time (for application logic, keep using datetime if needed elsewhere)
-        start_time_dt = datetime.now()
+        # Run inference, coalesced with other in-flight requests for the same model
+        # (made contiguous because orjson only serializes C-contiguous arrays)
+        outputs = (await prediction_batcher.predict(model, inputs)).cpu().contiguous().numpy()
 
-        # Run inference
-        with torch.no_grad():
-            outputs = model(inputs).numpy().tolist()
-
-        # Calculate inference time (for application logic)
-        inference_time_ms = (datetime.now() - start_time_dt).total_seconds() * 1000
+        # Calculate latency once and reuse it for the response and metrics
+        elapsed = time.perf_counter() - t0
+        inference_time_ms = elapsed * 1000
 
         # Log prediction asynchronously
         background_tasks.add_task(
             model_monitor.log_prediction,
             model_version,
-            request.inputs,
-            outputs,
+            tuple(inputs.shape),
+            outputs.shape,
             inference_time_ms
         )
 
@@ -121,9 +139,9 @@ async def predict(request: PredictionRequest, background_tasks: BackgroundTasks)
             "inference_time_ms": inference_time_ms
         }
         # Record latency metric on success
-        latency = time.time() - start_timer
-        prediction_latency.labels(model_version=model_version_label).observe(latency)
-        return response_data
+        prediction_latency.labels(model_version=model_version_label).observe(elapsed)
+        # Returned directly so orjson serializes the numpy outputs without a Python list round-trip
+        return ORJSONResponse(response_data)
 
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
@@ -134,6 +152,12 @@ async def predict(request: PredictionRequest, background_tasks: BackgroundTasks)
         # Increment request counter regardless of success/failure
         request_counter.labels(endpoint="/predict", method="POST", status_code=status_code).inc()
 
+async def save_upload(upload: UploadFile, path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Stream an uploaded file to disk in chunks instead of reading it into memory"""
+    async with aiofiles.open(path, "wb") as f:
+        while chunk := await upload.read(chunk_size):
+            await f.write(chunk)
+
 @app.post("/models/upload")
 async def upload_model(
     model_file: UploadFile = File(...),
@@ -152,16 +176,14 @@ async def upload_model(
         
         # Save model file
         model_path = os.path.join(model_dir, "model.pt")
-        with open(model_path, "wb") as f:
-            f.write(await model_file.read())
+        await save_upload(model_file, model_path)
         
         # Save config file
         config_path = os.path.join(model_dir, "config.json")
-        with open(config_path, "wb") as f:
-            f.write(await config_file.read())
+        await save_upload(config_file, config_path)
         
-        # Reload models
-        model_manager.load_models()
+        # Load only the new version; other loaded models stay warm
+        model_manager.load_single(version)
         
         return {"message": f"Model version {version} uploaded successfully"}
     
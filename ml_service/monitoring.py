@@ -1,45 +1,78 @@
 import os
-import json
+import orjson
 import time
 import logging
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import pandas as pd
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import threading
+import atexit
+import mmap
+from collections import defaultdict, deque
+
+from drift_kernels import drift_kernel
 
 logger = logging.getLogger(__name__)
 
+# Number of locks the per-version metrics are striped across (power of two)
+LOCK_STRIPES = 16
+
+# Buffers passed to a single writev call (stays under the usual IOV_MAX of 1024)
+WRITEV_MAX_BUFFERS = 1024
+
 class ModelMonitor:
-    def __init__(self, metrics_dir="metrics"):
+    def __init__(self, metrics_dir="metrics", flush_interval: float = 0.05):
         self.metrics_dir = metrics_dir
         self.metrics_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        
+        # Pending (model_version, log entry) pairs; deque appends are thread-safe
+        self._pending = deque()
+        
+        # In-memory aggregates per model version, persisted by the flusher for versions marked dirty.
+        # Versions are striped across LOCK_STRIPES locks so different versions update in parallel;
+        # each stripe guards its versions' cells and its own dirty set.
+        self._cells: Dict[str, Dict[str, Any]] = {}
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._dirty = [set() for _ in range(LOCK_STRIPES)]
+        
+        # Per-thread drift output buffers keyed by feature count, reused across calls
+        self._drift_scratch = threading.local()
+        
+        # Read-only memory maps of predictions logs, remapped when a log's size changes
+        self._mmaps: Dict[str, mmap.mmap] = {}
+        self._mmaps_lock = threading.Lock()
+        
+        # Append-mode file descriptors for prediction logs, kept open across flushes
+        self._fds: Dict[str, int] = {}
+        
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
         
         # Create metrics directory if it doesn't exist
         os.makedirs(self.metrics_dir, exist_ok=True)
+        
+        # Background thread that batches log writes and metric updates off the request path
+        self._flusher = threading.Thread(target=self._flush_loop, name="model-monitor-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
     
-    def log_prediction(self, model_version: str, inputs: List[List[float]], 
-                       outputs: List[Any], inference_time: float):
-        """Log a prediction for monitoring purposes"""
+    def log_prediction(self, model_version: str, inputs_shape: Tuple[int, ...], 
+                       outputs_shape: Tuple[int, ...], inference_time: float):
+        """Queue a prediction log entry for the background flusher"""
         try:
-            timestamp = datetime.now().isoformat()
-            
+            # The flusher stamps the timestamp once per batch
             log_entry = {
-                "timestamp": timestamp,
+                "timestamp": None,
                 "model_version": model_version,
                 "inference_time_ms": inference_time,
-                "inputs_shape": [len(inputs), len(inputs[0]) if inputs else 0],
-                "outputs_shape": [len(outputs), len(outputs[0]) if outputs and isinstance(outputs[0], list) else 0]
+                "inputs_shape": self._shape(inputs_shape),
+                "outputs_shape": self._shape(outputs_shape)
             }
             
-            # Get the log file path for this model version
-            log_file = os.path.join(self.metrics_dir, f"{model_version}_predictions.jsonl")
-            
-            # Append to log file
-            with self.metrics_lock:
-                with open(log_file, "a") as f:
-                    f.write(json.dumps(log_entry) + "\n")
+            self._pending.append((model_version, log_entry))
             
             # Update aggregated metrics
             self._update_metrics(model_version, inference_time)
@@ -47,45 +80,164 @@ class ModelMonitor:
         except Exception as e:
             logger.error(f"Error logging prediction: {str(e)}")
     
-    def _update_metrics(self, model_version: str, inference_time: float):
-        """Update aggregated metrics for a model version"""
-        metrics_file = os.path.join(self.metrics_dir, f"{model_version}_metrics.json")
+    @staticmethod
+    def _shape(shape: Tuple[int, ...]) -> List[int]:
+        """Return a tensor shape as [rows, columns], with 0 columns for 1-D data"""
+        return [shape[0], shape[1] if len(shape) > 1 else 0]
+    
+    def _flush_loop(self):
+        """Flush pending entries every flush_interval seconds, or sooner when signalled"""
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+    
+    def flush(self):
+        """Write all pending log entries and persist metrics for versions updated since the last flush"""
+        with self.metrics_lock:
+            # One wall-clock read per flush, shared by every entry and metrics update in the batch
+            now_iso = datetime.now().isoformat()
+            
+            lines = defaultdict(list)
+            while True:
+                try:
+                    model_version, log_entry = self._pending.popleft()
+                except IndexError:
+                    break
+                log_entry["timestamp"] = now_iso
+                lines[model_version].append(orjson.dumps(log_entry) + b"\n")
+            
+            for model_version, version_lines in lines.items():
+                try:
+                    # Append the whole batch for this version in as few syscalls as possible
+                    self._write_lines(self._fd(model_version), version_lines)
+                except Exception as e:
+                    logger.error(f"Error flushing predictions for {model_version}: {str(e)}")
+            
+            # Snapshot dirty cells under their stripe locks, write them outside
+            snapshots = {}
+            for lock, dirty in zip(self._locks, self._dirty):
+                with lock:
+                    for model_version in dirty:
+                        cell = self._cells[model_version]
+                        cell["last_updated"] = now_iso
+                        snapshots[model_version] = self._snapshot(cell)
+                    dirty.clear()
+            
+            for model_version, metrics in snapshots.items():
+                try:
+                    metrics_file = os.path.join(self.metrics_dir, f"{model_version}_metrics.json")
+                    with open(metrics_file, "wb") as f:
+                        f.write(orjson.dumps(metrics, option=orjson.OPT_INDENT_2))
+                except Exception as e:
+                    logger.error(f"Error saving metrics for {model_version}: {str(e)}")
+    
+    def _fd(self, model_version: str) -> int:
+        """Return the cached append-mode descriptor for a version's predictions log"""
+        fd = self._fds.get(model_version)
+        if fd is None:
+            log_file = os.path.join(self.metrics_dir, f"{model_version}_predictions.jsonl")
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_CLOEXEC", 0)
+            fd = self._fds[model_version] = os.open(log_file, flags, 0o644)
+        return fd
+    
+    @staticmethod
+    def _write_lines(fd: int, lines: List[bytes]):
+        """Write buffers to a descriptor, using writev where available"""
+        if not hasattr(os, "writev"):
+            data = memoryview(b"".join(lines))
+            while data:
+                data = data[os.write(fd, data):]
+            return
         
+        for start in range(0, len(lines), WRITEV_MAX_BUFFERS):
+            batch = lines[start:start + WRITEV_MAX_BUFFERS]
+            written = os.writev(fd, batch)
+            
+            # Finish a short write with the remaining bytes
+            if written < sum(map(len, batch)):
+                remaining = memoryview(b"".join(batch))[written:]
+                while remaining:
+                    remaining = remaining[os.write(fd, remaining):]
+    
+    def close(self):
+        """Stop the flusher, flush pending entries and close cached log descriptors and memory maps"""
+        atexit.unregister(self.close)
+        self._stop_event.set()
+        self._flush_event.set()
+        self._flusher.join()
+        self.flush()
         with self.metrics_lock:
-            # Load existing metrics or create new ones
-            if os.path.exists(metrics_file):
-                with open(metrics_file, "r") as f:
-                    metrics = json.load(f)
-            else:
-                metrics = {
-                    "total_predictions": 0,
-                    "avg_inference_time_ms": 0,
-                    "min_inference_time_ms": float('inf'),
-                    "max_inference_time_ms": 0,
-                    "last_updated": None
-                }
-            
-            # Update metrics
-            n = metrics["total_predictions"]
-            metrics["total_predictions"] += 1
-            metrics["avg_inference_time_ms"] = (metrics["avg_inference_time_ms"] * n + inference_time) / (n + 1)
-            metrics["min_inference_time_ms"] = min(metrics["min_inference_time_ms"], inference_time)
-            metrics["max_inference_time_ms"] = max(metrics["max_inference_time_ms"], inference_time)
-            metrics["last_updated"] = datetime.now().isoformat()
-            
-            # Save updated metrics
-            with open(metrics_file, "w") as f:
-                json.dump(metrics, f, indent=2)
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+        with self._mmaps_lock:
+            for mm in self._mmaps.values():
+                mm.close()
+            self._mmaps.clear()
+    
+    @staticmethod
+    def _stripe(model_version: str) -> int:
+        """Index of the lock stripe guarding a version's metrics"""
+        return hash(model_version) & (LOCK_STRIPES - 1)
+    
+    def _load_cell(self, model_version: str) -> Dict[str, Any]:
+        """Seed the in-memory aggregates for a version from its metrics file, if any"""
+        metrics_file = os.path.join(self.metrics_dir, f"{model_version}_metrics.json")
+        
+        # Load existing metrics or create new ones
+        if os.path.exists(metrics_file):
+            with open(metrics_file, "rb") as f:
+                metrics = orjson.loads(f.read())
+            return {
+                "count": metrics["total_predictions"],
+                "sum_ms": metrics["avg_inference_time_ms"] * metrics["total_predictions"],
+                "min_ms": metrics["min_inference_time_ms"],
+                "max_ms": metrics["max_inference_time_ms"],
+                "last_updated": metrics["last_updated"]
+            }
+        
+        return {"count": 0, "sum_ms": 0.0, "min_ms": float('inf'), "max_ms": 0, "last_updated": None}
+    
+    @staticmethod
+    def _snapshot(cell: Dict[str, Any]) -> Dict[str, Any]:
+        """Render a cell in the metrics file format"""
+        return {
+            "total_predictions": cell["count"],
+            "avg_inference_time_ms": cell["sum_ms"] / cell["count"] if cell["count"] else 0,
+            "min_inference_time_ms": cell["min_ms"],
+            "max_inference_time_ms": cell["max_ms"],
+            "last_updated": cell["last_updated"]
+        }
+    
+    def _update_metrics(self, model_version: str, inference_time: float):
+        """Update in-memory aggregated metrics for a model version"""
+        stripe = self._stripe(model_version)
+        with self._locks[stripe]:
+            cell = self._cells.get(model_version)
+            if cell is None:
+                cell = self._cells[model_version] = self._load_cell(model_version)
+            
+            cell["count"] += 1
+            cell["sum_ms"] += inference_time
+            cell["min_ms"] = min(cell["min_ms"], inference_time)
+            cell["max_ms"] = max(cell["max_ms"], inference_time)
+            self._dirty[stripe].add(model_version)
     
     def get_model_metrics(self, model_version: str) -> Dict[str, Any]:
         """Get performance metrics for a specific model version"""
-        metrics_file = os.path.join(self.metrics_dir, f"{model_version}_metrics.json")
+        # Include predictions still waiting for the background flusher
+        self.flush()
         
-        if not os.path.exists(metrics_file):
-            raise FileNotFoundError(f"Metrics for model version {model_version} not found")
+        metrics_file = os.path.join(self.metrics_dir, f"{model_version}_metrics.json")
         
-        with open(metrics_file, "r") as f:
-            metrics = json.load(f)
+        with self._locks[self._stripe(model_version)]:
+            cell = self._cells.get(model_version)
+            if cell is None:
+                if not os.path.exists(metrics_file):
+                    raise FileNotFoundError(f"Metrics for model version {model_version} not found")
+                cell = self._cells[model_version] = self._load_cell(model_version)
+            metrics = self._snapshot(cell)
         
         # Add additional analysis if prediction logs are available
         predictions_file = os.path.join(self.metrics_dir, f"{model_version}_predictions.jsonl")
@@ -97,23 +249,19 @@ class ModelMonitor:
     
     def _analyze_recent_performance(self, predictions_file: str, limit: int = 1000) -> Dict[str, Any]:
         """Analyze the most recent predictions for performance trends"""
-        # Read the last N predictions
-        predictions = []
-        with open(predictions_file, "r") as f:
-            for line in f:
-                predictions.append(json.loads(line))
-                if len(predictions) >= limit:
-                    predictions = predictions[-limit:]
-        
-        if not predictions:
+        # Only the last `limit` lines are touched, straight from the page cache
+        lines = self._tail_lines(predictions_file, limit)
+        
+        if not lines:
             return {}
         
-        # Extract timestamps and inference times
-        timestamps = [datetime.fromisoformat(p["timestamp"]) for p in predictions]
-        inference_times = [p["inference_time_ms"] for p in predictions]
+        # Parse inference times straight into a NumPy buffer
+        inference_times = np.fromiter(
+            (orjson.loads(line)["inference_time_ms"] for line in lines), dtype=np.float64, count=len(lines)
+        )
         
         # Calculate time-based metrics
-        recent_avg_time = np.mean(inference_times[-100:]) if len(inference_times) >= 100 else np.mean(inference_times)
+        recent_avg_time = np.mean(inference_times[-100:])
         
         # Check for performance degradation
         is_slowing = False
@@ -123,12 +271,49 @@ class ModelMonitor:
             is_slowing = recent_100 > previous_100 * 1.1  # 10% slowdown
         
         return {
-            "recent_predictions_count": len(predictions),
-            "recent_avg_inference_time_ms": recent_avg_time,
-            "performance_degradation_detected": is_slowing,
-            "last_prediction_time": timestamps[-1].isoformat() if timestamps else None
+            "recent_predictions_count": len(lines),
+            "recent_avg_inference_time_ms": float(recent_avg_time),
+            "performance_degradation_detected": bool(is_slowing),
+            "last_prediction_time": orjson.loads(lines[-1])["timestamp"]
         }
     
+    def _drift_buffers(self, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return this thread's reusable (mean_drift, std_ratio) buffers for a feature count"""
+        buffers = getattr(self._drift_scratch, "buffers", None)
+        if buffers is None:
+            buffers = self._drift_scratch.buffers = {}
+        
+        if n_features not in buffers:
+            buffers[n_features] = (np.empty(n_features), np.empty(n_features))
+        return buffers[n_features]
+    
+    def _tail_lines(self, predictions_file: str, limit: int) -> List[bytes]:
+        """Return up to `limit` last non-empty lines of a predictions log using a cached memory map"""
+        size = os.path.getsize(predictions_file)
+        if size == 0:
+            return []
+        
+        with self._mmaps_lock:
+            mm = self._mmaps.get(predictions_file)
+            if mm is None or len(mm) != size:
+                if mm is not None:
+                    mm.close()
+                with open(predictions_file, "rb") as f:
+                    mm = self._mmaps[predictions_file] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            
+            # Walk backwards from the end one newline at a time
+            lines = []
+            end = len(mm)
+            while end > 0 and len(lines) < limit:
+                start = mm.rfind(b"\n", 0, end - 1) + 1
+                line = mm[start:end].rstrip(b"\n")
+                if line:
+                    lines.append(line)
+                end = start
+        
+        lines.reverse()
+        return lines
+    
     def detect_data_drift(self, model_version: str, reference_data: List[List[float]], 
                          current_data: List[List[float]]) -> Dict[str, Any]:
         """
@@ -143,26 +328,25 @@ class ModelMonitor:
             Dictionary with drift metrics
         """
         try:
-            # Convert to numpy arrays
-            ref_data = np.array(reference_data)
-            curr_data = np.array(current_data)
-            
-            # Basic statistical drift detection
-            ref_mean = np.mean(ref_data, axis=0)
-            curr_mean = np.mean(curr_data, axis=0)
+            # Convert to contiguous numpy arrays
+            ref_data = np.ascontiguousarray(reference_data, dtype=np.float64)
+            curr_data = np.ascontiguousarray(current_data, dtype=np.float64)
             
-            ref_std = np.std(ref_data, axis=0)
-            curr_std = np.std(curr_data, axis=0)
+            # The compiled kernel does no bounds checking, so validate shapes up front
+            if ref_data.ndim != 2 or curr_data.ndim != 2 or ref_data.shape[1] != curr_data.shape[1]:
+                raise ValueError(f"Incompatible data shapes {ref_data.shape} and {curr_data.shape}")
+            if not len(ref_data) or not len(curr_data):
+                raise ValueError("Reference and current data must not be empty")
             
-            # Calculate drift metrics
-            mean_drift = np.abs(ref_mean - curr_mean) / (ref_std + 1e-10)  # Normalized mean difference
-            std_ratio = curr_std / (ref_std + 1e-10)  # Ratio of standard deviations
+            # Basic statistical drift detection in one fused, parallel pass over both matrices
+            mean_drift, std_ratio = self._drift_buffers(ref_data.shape[1])
+            drift_kernel(ref_data, curr_data, mean_drift, std_ratio)
             
             # Calculate drift score (higher score means more drift)
             drift_score = np.mean(mean_drift)
             
             # Determine if drift is significant
-            is_significant = drift_score > 0.5 or np.any(std_ratio > 2.0) or np.any(std_ratio < 0.5)
+            is_significant = bool(drift_score > 0.5 or np.any((std_ratio > 2.0) | (std_ratio < 0.5)))
             
             return {
                 "model_version": model_version,
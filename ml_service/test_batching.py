@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+import torch
+
+from batching import PredictionBatcher
+
+class DoublingModel(torch.nn.Module):
+    """Doubles its input and records the batch size of every forward pass"""
+
+    def __init__(self, truncate: bool = False):
+        super().__init__()
+        self.truncate = truncate
+        self.batch_sizes = []
+
+    def forward(self, x):
+        self.batch_sizes.append(x.shape[0])
+        out = x * 2
+        # Drop a row to simulate a model whose output does not match its batch
+        return out[:-1] if self.truncate else out
+
+def test_concurrent_predictions_share_one_forward_pass():
+    """Concurrent predict() calls run as one batch and each caller gets its own slice"""
+    model = DoublingModel()
+    inputs = [torch.full((rows, 3), float(rows)) for rows in (1, 2, 3, 4)]
+
+    async def scenario():
+        batcher = PredictionBatcher(max_batch_size=64, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(batcher.predict(model, x) for x in inputs)), timeout=5
+            )
+        finally:
+            await batcher.stop()
+
+    outputs = asyncio.run(scenario())
+
+    assert model.batch_sizes == [10]
+    for x, out in zip(inputs, outputs):
+        assert torch.equal(out, x * 2)
+
+def test_wrong_batch_size_fails_request_and_keeps_serving():
+    """A model output without a matching batch dimension fails its requests, not the loop"""
+    model = DoublingModel(truncate=True)
+
+    async def scenario():
+        batcher = PredictionBatcher(max_batch_size=64, max_wait_ms=1)
+        batcher.start()
+        try:
+            with pytest.raises(ValueError):
+                await asyncio.wait_for(batcher.predict(model, torch.ones(2, 3)), timeout=5)
+
+            model.truncate = False
+            return await asyncio.wait_for(batcher.predict(model, torch.ones(2, 3)), timeout=5)
+        finally:
+            await batcher.stop()
+
+    output = asyncio.run(scenario())
+
+    assert torch.equal(output, torch.full((2, 3), 2.0))
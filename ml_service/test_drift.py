@@ -0,0 +1,35 @@
+import numpy as np
+
+from monitoring import ModelMonitor
+
+def test_detect_data_drift_large_mean(tmp_path):
+    """Samples from the same distribution with a large mean should not register as drift"""
+    monitor = ModelMonitor(metrics_dir=str(tmp_path))
+    try:
+        rng = np.random.default_rng(0)
+        reference = rng.normal(1e8, 1.0, size=(500, 3))
+        current = rng.normal(1e8, 1.0, size=(500, 3))
+
+        result = monitor.detect_data_drift("v1", reference.tolist(), current.tolist())
+
+        assert "error" not in result
+        assert result["drift_score"] < 0.5
+        np.testing.assert_allclose(result["std_ratio"], current.std(axis=0) / reference.std(axis=0), rtol=1e-6)
+        assert result["is_significant"] is False
+    finally:
+        monitor.close()
+
+def test_detect_data_drift_shifted_mean(tmp_path):
+    """A mean shift of several standard deviations should register as drift"""
+    monitor = ModelMonitor(metrics_dir=str(tmp_path))
+    try:
+        rng = np.random.default_rng(0)
+        reference = rng.normal(1e8, 1.0, size=(500, 3))
+        current = rng.normal(1e8 + 5.0, 1.0, size=(500, 3))
+
+        result = monitor.detect_data_drift("v1", reference.tolist(), current.tolist())
+
+        assert result["drift_score"] > 4.0
+        assert result["is_significant"] is True
+    finally:
+        monitor.close()
@@ -1,14 +1,16 @@
-import requests
+import asyncio
+import httpx
 import json
 import os
 import time
 import torch
 import torch.nn as nn
-import requests
 
 BASE_URL = "http://localhost:8001"
 MODELS_DIR = "test_models"
 METRICS_DIR = "test_metrics"
+CONCURRENT_REQUESTS = 50  # Parallel /predict calls in the load test
+METRICS_TIMEOUT = 10  # Seconds to wait for metrics to appear after predictions
 
 # Ensure test directories exist
 os.makedirs(MODELS_DIR, exist_ok=True)
@@ -58,46 +60,49 @@ def cleanup_dummy_files(version="v_test"):
     if os.path.exists(predictions_file):
         os.remove(predictions_file)
 
-# --- Test Functions ---
-def test_root():
+# --- API Checks (run as a script; not collected by pytest) ---
+async def check_root(client):
     print("\n--- Testing Root Endpoint (/) ---")
     try:
-        response = requests.get(f"{BASE_URL}/")
+        response = await client.get("/")
         response.raise_for_status()
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.json()}")
         return True
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
         return False
 
-def test_list_models():
+async def check_list_models(client):
     print("\n--- Testing List Models Endpoint (/models) ---")
     try:
-        response = requests.get(f"{BASE_URL}/models")
+        response = await client.get("/models")
         response.raise_for_status()
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.json()}")
         return response.json().get("models", [])
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
         return []
 
-def test_upload_model(version="v_test"):
+async def check_upload_model(client, version="v_test"):
     print(f"\n--- Testing Upload Model Endpoint (/models/upload) with version {version} ---")
     model_path, config_path = create_dummy_model_files(version)
+    response = None
     try:
+        # Pass open file handles, never their bytes: httpx sizes them via fstat and streams the
+        # multipart body from disk in small chunks, so memory stays flat regardless of model size
         with open(model_path, 'rb') as mf, open(config_path, 'rb') as cf:
             files = {
                 'model_file': (os.path.basename(model_path), mf, 'application/octet-stream'),
                 'config_file': (os.path.basename(config_path), cf, 'application/json')
             }
-            response = requests.post(f"{BASE_URL}/models/upload?version={version}", files=files)
+            response = await client.post("/models/upload", params={"version": version}, files=files)
             response.raise_for_status()
             print(f"Status Code: {response.status_code}")
             print(f"Response: {response.json()}")
             return True
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
         if response is not None:
             print(f"Response Text: {response.text}")
@@ -107,105 +112,132 @@ def test_upload_model(version="v_test"):
         # cleanup_dummy_files(version) # Keep files for subsequent tests
         pass
 
-def test_predict(model_version="latest", sample_input=[[1.0, 2.0, 3.0, 4.0]]):
+async def check_predict(client, model_version="latest", sample_input=[[1.0, 2.0, 3.0, 4.0]]):
     print(f"\n--- Testing Predict Endpoint (/predict) with version {model_version} ---")
     payload = {"inputs": sample_input, "model_version": model_version}
-    headers = {"Content-Type": "application/json"}
+    response = None
     try:
-        response = requests.post(f"{BASE_URL}/predict", headers=headers, json=payload)
+        response = await client.post("/predict", json=payload)
         response.raise_for_status()
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.json()}")
         return True
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
         if response is not None:
             print(f"Response Text: {response.text}")
         return False
 
-def test_get_metrics(version):
+async def check_predict_concurrent(client, model_version="latest", n=CONCURRENT_REQUESTS, sample_input=[[1.0, 2.0, 3.0, 4.0]]):
+    print(f"\n--- Testing {n} Concurrent Predictions (/predict) with version {model_version} ---")
+    payload = {"inputs": sample_input, "model_version": model_version}
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *(client.post("/predict", json=payload) for _ in range(n)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for r in responses if isinstance(r, httpx.Response) and r.status_code == 200)
+    print(f"Succeeded: {succeeded}/{n} in {elapsed:.2f}s ({n / elapsed:.1f} req/s)")
+    return succeeded == n
+
+async def check_get_metrics(client, version):
     print(f"\n--- Testing Get Metrics Endpoint (/models/{version}/metrics) ---")
     if not version:
         print("Skipping metrics test: No version specified.")
         return False
+
+    async def poll():
+        # Metrics are written in the background after a prediction; retry until they appear
+        while True:
+            response = await client.get(f"/models/{version}/metrics")
+            if response.status_code == 200:
+                return response
+            await asyncio.sleep(0.1)
+
     try:
-        # Wait a bit for metrics to potentially be generated after prediction
-        time.sleep(2)
-        response = requests.get(f"{BASE_URL}/models/{version}/metrics")
-        response.raise_for_status()
+        response = await asyncio.wait_for(poll(), timeout=METRICS_TIMEOUT)
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.json()}")
         return True
-    except requests.exceptions.RequestException as e:
-        print(f"Error: {e}")
-        if response is not None:
-            print(f"Response Text: {response.text}")
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
+        print(f"Error: {e!r}")
         return False
 
-def test_activate_model(version):
+async def check_activate_model(client, version):
     print(f"\n--- Testing Activate Model Endpoint (/models/{version}/activate) ---")
     if not version:
         print("Skipping activation test: No version specified.")
         return False
+    response = None
     try:
-        response = requests.post(f"{BASE_URL}/models/{version}/activate")
+        response = await client.post(f"/models/{version}/activate")
         response.raise_for_status()
         print(f"Status Code: {response.status_code}")
         print(f"Response: {response.json()}")
         return True
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
         if response is not None:
             print(f"Response Text: {response.text}")
         return False
 
-if __name__ == "__main__":
+async def main():
     print("Starting ML Service API Tests...")
     test_version = "v_test_run"
 
-    # 1. Check if API is running
-    if not test_root():
-        print("API root not accessible. Exiting tests.")
-        exit(1)
-
-    # 2. List initial models
-    initial_models = test_list_models()
-
-    # 3. Upload a new test model
-    upload_success = test_upload_model(test_version)
-
-    # 4. List models again to see the uploaded one
-    models_after_upload = test_list_models()
-    uploaded_model_found = any(m['version'] == test_version for m in models_after_upload)
-    print(f"Uploaded model {test_version} found in list: {uploaded_model_found}")
-
-    # 5. Test prediction (using the uploaded version if successful, else try latest)
-    predict_version = test_version if upload_success else "latest"
-    # Note: Prediction will likely fail with dummy model. This tests the endpoint call.
-    print(f"\nAttempting prediction with version: {predict_version} (expect failure with dummy model)")
-    test_predict(model_version=predict_version)
-
-    # 6. Test getting metrics (for the uploaded version if successful)
-    if upload_success:
-        test_get_metrics(test_version)
-    else:
-        print("Skipping metrics test as upload failed.")
-
-    # 7. Test activating the uploaded model (if successful)
-    if upload_success:
-        test_activate_model(test_version)
-        # Verify activation by listing models again
-        models_after_activation = test_list_models()
-        activated_model = next((m for m in models_after_activation if m['version'] == test_version), None)
-        if activated_model:
-            print(f"Model {test_version} is default after activation: {activated_model.get('is_default')}")
+    # One pooled client for every test so connections are reused
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits) as client:
+        # 1. Check if API is running
+        if not await check_root(client):
+            print("API root not accessible. Exiting tests.")
+            exit(1)
+
+        # 2. List initial models
+        await check_list_models(client)
+
+        # 3. Upload a new test model
+        upload_success = await check_upload_model(client, test_version)
+
+        # 4. List models again to see the uploaded one
+        models_after_upload = await check_list_models(client)
+        uploaded_model_found = any(m['version'] == test_version for m in models_after_upload)
+        print(f"Uploaded model {test_version} found in list: {uploaded_model_found}")
+
+        # 5. Test prediction (using the uploaded version if successful, else try latest)
+        predict_version = test_version if upload_success else "latest"
+        # Note: Prediction will likely fail with dummy model. This tests the endpoint call.
+        print(f"\nAttempting prediction with version: {predict_version} (expect failure with dummy model)")
+        await check_predict(client, model_version=predict_version)
+
+        # 6. Fire concurrent predictions to exercise request batching
+        await check_predict_concurrent(client, model_version=predict_version)
+
+        # 7. Test getting metrics (for the uploaded version if successful)
+        if upload_success:
+            await check_get_metrics(client, test_version)
+        else:
+            print("Skipping metrics test as upload failed.")
+
+        # 8. Test activating the uploaded model (if successful)
+        if upload_success:
+            await check_activate_model(client, test_version)
+            # Verify activation by listing models again
+            models_after_activation = await check_list_models(client)
+            activated_model = next((m for m in models_after_activation if m['version'] == test_version), None)
+            if activated_model:
+                print(f"Model {test_version} is default after activation: {activated_model.get('is_default')}")
+            else:
+                print(f"Could not verify activation for model {test_version}")
         else:
-            print(f"Could not verify activation for model {test_version}")
-    else:
-        print("Skipping activation test as upload failed.")
+            print("Skipping activation test as upload failed.")
 
     # Cleanup
     print(f"\nCleaning up dummy files for version {test_version}...")
     cleanup_dummy_files(test_version)
 
     print("\nML Service API Tests Finished.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
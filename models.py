@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
-import datetime
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from database import Base
+from utils import uuid7
 
 class DataRequest(Base):
     __tablename__ = "data_requests"
     
-    id = Column(String, primary_key=True)
-    status = Column(String, nullable=False, default="pending")
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
+    # Time-ordered UUIDv7 keys append to the right edge of the B-tree instead of random pages
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    status = Column(String, nullable=False, default="pending", index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
     records_processed = Column(Integer, default=0)
     error_message = Column(String, nullable=True)
     
@@ -20,11 +23,20 @@ class ProcessedData(Base):
     __tablename__ = "processed_data"
     
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(String, ForeignKey("data_requests.id"))
+    request_id = Column(UUID(as_uuid=True), ForeignKey("data_requests.id"))
     source = Column(String, nullable=False)
-    category = Column(String, index=True)
-    data = Column(JSON, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    category = Column(String)
+    data = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationship to the data request
     request = relationship("DataRequest", back_populates="processed_data")
+    
+    __table_args__ = (
+        # Supports category-filtered keyset pagination on /data
+        Index("ix_processed_category_id", "category", "id"),
+        # Serves "rows for a request", optionally narrowed to one category
+        Index("ix_processed_request_category", "request_id", "category"),
+        # Serves containment/key-existence filters on the JSONB payload
+        Index("ix_processed_data_data_gin", "data", postgresql_using="gin"),
+    )
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 class DataSource(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     source_type: str  # "rest" or "graphql"
     url: HttpUrl
     headers: Optional[Dict[str, str]] = None
@@ -10,30 +12,43 @@ class DataSource(BaseModel):
     params: Optional[Dict[str, Any]] = None  # For REST
 
 class TransformationRule(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     field: str
     operation: str  # "rename", "filter", "aggregate", etc.
     params: Dict[str, Any]
 
 class DataIngestionRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     sources: List[DataSource]
     transformation_rules: Optional[List[TransformationRule]] = None
 
 class JobResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     job_id: str
     status: str
 
 class JobStatus(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     job_id: str
     status: str
     records_processed: Optional[int] = None
     error_message: Optional[str] = None
 
 class ProcessedDataResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+    
     id: int
     source: str
     category: str
     data: Dict[str, Any]
     created_at: datetime
+
+class ProcessedDataPage(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
     
-    class Config:
-        orm_mode = True
+    items: List[ProcessedDataResponse]
+    next_cursor: Optional[int] = None  # Pass as `after` to fetch the next page
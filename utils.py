@@ -1,23 +1,76 @@
 from pydantic import BaseModel, HttpUrl
 from typing import Any, Dict, List, Union
 import json
+import orjson
+import os
+import time
+import uuid
+
+_PRIMITIVE_TYPES = {str, int, float, bool, type(None)}
+
+def _serialize_dict(obj: Dict[Any, Any]) -> Dict[Any, Any]:
+    """Serialize each value of a dictionary."""
+    return {k: ensure_serializable(v) for k, v in obj.items()}
+
+def _serialize_sequence(obj: Any) -> List[Any]:
+    """Serialize a list, tuple or set into a list."""
+    return [ensure_serializable(item) for item in obj]
+
+# Converters keyed by exact type, so the common cases cost one dict lookup
+_HANDLERS = {
+    dict: _serialize_dict,
+    list: _serialize_sequence,
+    tuple: _serialize_sequence,
+    set: _serialize_sequence,
+    HttpUrl: str,
+}
 
 def ensure_serializable(obj: Any) -> Any:
     """Ensure an object is JSON serializable, converting special types when needed."""
-    if isinstance(obj, HttpUrl):
-        return str(obj)
-    elif isinstance(obj, BaseModel):
-        return ensure_serializable(obj.dict())
-    elif isinstance(obj, dict):
-        return {k: ensure_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [ensure_serializable(item) for item in obj]
-    elif isinstance(obj, tuple):
-        return [ensure_serializable(item) for item in obj]
-    elif isinstance(obj, set):
-        return [ensure_serializable(item) for item in obj]
+    obj_type = type(obj)
+    if obj_type in _PRIMITIVE_TYPES:
+        return obj
+    
+    handler = _HANDLERS.get(obj_type)
+    if handler is not None:
+        return handler(obj)
+    
+    # Pydantic's JSON mode already stringifies URLs and other special types
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    
+    # Subclasses of the handled types
+    for base, handler in _HANDLERS.items():
+        if isinstance(obj, base):
+            return handler(obj)
     return obj
 
 def serialize_pydantic(model: Union[BaseModel, List[BaseModel], Dict[str, Any]]) -> Dict[str, Any]:
     """Convert Pydantic models to dictionaries that are fully JSON serializable."""
     return ensure_serializable(model)
+
+def _orjson_default(obj: Any) -> Any:
+    """Fallback for types orjson cannot serialize natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, HttpUrl):
+        return str(obj)
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+def serialize_pydantic_to_bytes(model: Union[BaseModel, List[BaseModel], Dict[str, Any]]) -> bytes:
+    """Serialize Pydantic models straight to JSON bytes, skipping the intermediate dictionary."""
+    if isinstance(model, BaseModel):
+        return model.model_dump_json().encode()
+    return orjson.dumps(model, default=_orjson_default)
+
+def uuid7() -> uuid.UUID:
+    """Generate a time-ordered UUIDv7: a 48-bit Unix millisecond timestamp followed by random bits."""
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    
+    value = (unix_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76  # version
+    value |= ((rand >> 62) & 0xFFF) << 64
+    value |= 0b10 << 62  # RFC 4122 variant
+    value |= rand & ((1 << 62) - 1)
+    return uuid.UUID(int=value)